@@ -4,12 +4,16 @@
 import os
 import json
 
+import daiquiri
 import pandas as pd
 import seaborn as sns
 
 from deeposlandia import utils
 
 
+logger = daiquiri.getLogger(__name__)
+
+
 def set_label_color(nb_colors):
     """Set a color for each aggregated label with seaborn palettes
 
@@ -117,10 +121,7 @@ if __name__ == "__main__":
     )
     args = parser.parse_args()
     label_aggregated = main(args.datapath)
-    with open(os.path.join(args.datapath, args.save), "w") as fobj:
-        print(
-            "write the file '{}'".format(
-                os.path.join(args.datapath, args.save)
-            )
-        )
+    output_filename = os.path.join(args.datapath, args.save)
+    with open(output_filename, "w") as fobj:
+        logger.info("Write the file '%s'", output_filename)
         json.dump(label_aggregated, fobj)
@@ -18,6 +18,11 @@ from PIL import Image
 
 from deeposlandia import geometries
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = daiquiri.getLogger(__name__)
 
 
@@ -25,6 +30,24 @@ AVAILABLE_DATASETS = ("shapes", "mapillary", "aerial", "tanzania")
 GEOGRAPHIC_DATASETS = ("aerial", "tanzania")
 
 
+def dump_json(obj):
+    """Serialize `obj` as json, with orjson if it is installed
+
+    Parameters
+    ----------
+    obj : object
+        Object to serialize
+
+    Returns
+    -------
+    bytes
+        UTF-8 encoded json document
+    """
+    if orjson is None:
+        return json.dumps(obj).encode()
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
 class Dataset(metaclass=abc.ABCMeta):
     """Generic class that describes the behavior of a Dataset object: it is
     initialized at least with an image size, its label are added always through
@@ -93,22 +116,37 @@ class Dataset(metaclass=abc.ABCMeta):
         """
         return len(self.image_info)
 
+    def get_label_matrix(self):
+        """Gather the image labels as a single contiguous array, the i-th row
+        being the 0-1 label vector of the i-th image
+
+        Returns
+        -------
+        numpy.array
+            Label occurrences, of shape (nb_images, nb_labels)
+        """
+        if self.get_nb_images() == 0:
+            return np.zeros((0, self.get_nb_labels()), dtype=np.uint8)
+        nb_labels = len(self.image_info[0]["labels"])
+        label_matrix = np.empty(
+            (self.get_nb_images(), nb_labels), dtype=np.uint8
+        )
+        for row, img in zip(label_matrix, self.image_info):
+            labels = img["labels"]
+            # datasets saved by former versions store labels as dicts
+            if isinstance(labels, dict):
+                labels = list(labels.values())
+            row[:] = labels
+        return label_matrix
+
     def get_label_popularity(self):
         """Return the label popularity in the current dataset, *i.e.* the
         proportion of images that contain corresponding object
         """
-        labels = [img["labels"] for img in self.image_info]
         if self.get_nb_images() == 0:
             logger.error("No images in the dataset.")
             return None
-        else:
-            return np.round(
-                np.divide(
-                    sum(np.array([list(l.values()) for l in labels])),
-                    self.get_nb_images(),
-                ),
-                3,
-            )
+        return np.round(self.get_label_matrix().mean(axis=0), 3)
 
     def add_label(
         self,
@@ -139,7 +177,8 @@ class Dataset(metaclass=abc.ABCMeta):
         contained_labels : list
             List of raw labels aggregated by the current label
         """
-        if label_id in self.label_info:
+        # label ids are the label positions in `label_info`
+        if label_id < len(self.label_info):
             logger.error(
                 "Label %s already stored into the label set.", label_id
             )
@@ -166,15 +205,17 @@ class Dataset(metaclass=abc.ABCMeta):
         filename : str
             String designing the relative path where the dataset must be saved
         """
-        with open(filename, "w") as fp:
-            json.dump(
-                {
-                    "image_size": self.image_size,
-                    "labels": self.label_info,
-                    "images": self.image_info,
-                },
-                fp,
-            )
+        # images are serialized one at a time, so as to never hold the whole
+        # json document in memory
+        with open(filename, "wb") as fp:
+            fp.write(b'{"image_size": ' + dump_json(self.image_size))
+            fp.write(b', "labels": ' + dump_json(self.label_info))
+            fp.write(b', "images": [')
+            for idx, image in enumerate(self.image_info):
+                if idx > 0:
+                    fp.write(b", ")
+                fp.write(dump_json(image))
+            fp.write(b"]}")
         logger.info("The dataset has been saved into %s", filename)
 
     def load(self, filename, nb_images=None):
@@ -191,8 +232,12 @@ class Dataset(metaclass=abc.ABCMeta):
             Number of images that must be loaded (if None, the whole dataset is
         loaded)
         """
-        with open(filename) as fp:
-            ds = json.load(fp)
+        if orjson is None:
+            with open(filename) as fp:
+                ds = json.load(fp)
+        else:
+            with open(filename, "rb") as fp:
+                ds = orjson.loads(fp.read())
         self.image_size = ds["image_size"]
         self.label_info = ds["labels"]
         if nb_images is None:
@@ -253,14 +298,14 @@ class GeoreferencedDataset(Dataset):
         )
         new_filename = basename_decomp[0] + "_" + img_id_str + ".png"
         out_image_name = os.path.join(output_dir, "images", new_filename)
-        out_label_name = out_image_name.replace("images", "labels")
+        out_label_name = os.path.join(output_dir, "labels", new_filename)
         return {"image": out_image_name, "labels": out_label_name}
 
     def _serialize(
         self,
         tile_image,
         labelled_image,
-        label_dict,
+        label_vector,
         image_filename,
         output_dir,
         x,
@@ -276,7 +321,7 @@ class GeoreferencedDataset(Dataset):
         ----------
         tile_image : PIL.Image
         labelled_image : PIL.Image
-        label_dict : dict
+        label_vector : list
         image_filename : str
         output_dir : str
         x : int
@@ -294,13 +339,15 @@ class GeoreferencedDataset(Dataset):
         try:
             tile_image.verify()
             labelled_image.verify()
-            tile_image.save(dirs["image"])
-            labelled_image.save(dirs["labels"])
+            # preprocessed tiles are a rebuildable cache: favor PNG encoding
+            # speed over file size
+            tile_image.save(dirs["image"], compress_level=1)
+            labelled_image.save(dirs["labels"], compress_level=1)
             return {
                 "raw_filename": image_filename,
                 "image_filename": dirs["image"],
                 "label_filename": dirs["labels"],
-                "labels": label_dict,
+                "labels": label_vector,
             }
         except SyntaxError as se:
             logger.error(
@@ -344,6 +391,7 @@ class GeoreferencedDataset(Dataset):
             raster,
             format="PNG",
             srcWin=[x, y, self.image_size, self.image_size],
+            creationOptions=["ZLEVEL=1"],
         )
         return {
             "raw_filename": image_filename,
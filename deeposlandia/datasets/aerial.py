@@ -79,7 +79,10 @@ class AerialDataset(GeoreferencedDataset):
             image_filename.split("/")[-1], raw_img_width, raw_img_height
         )
 
-        label_filename = image_filename.replace("images", "labels")
+        image_dir, image_basename = os.path.split(image_filename)
+        label_filename = os.path.join(
+            os.path.dirname(image_dir), "labels", image_basename
+        )
         label_raster = gdal.Open(label_filename)
         labels = label_raster.ReadAsArray()
         labels = np.swapaxes(labels, 0, 1)
@@ -99,7 +102,7 @@ class AerialDataset(GeoreferencedDataset):
             mask = labels[
                 x:(x + self.image_size), y:(y + self.image_size)
             ]
-            label_dict = utils.build_labels(
+            label_vector = utils.build_labels(
                 mask, range(self.get_nb_labels()), "aerial"
             )
             labelled_image = Image.fromarray(mask)
@@ -107,7 +110,7 @@ class AerialDataset(GeoreferencedDataset):
                 tiled_results = self._serialize(
                     tile_image,
                     labelled_image,
-                    label_dict,
+                    label_vector,
                     image_filename,
                     output_dir,
                     x,
@@ -124,7 +127,7 @@ class AerialDataset(GeoreferencedDataset):
                 tiled_results_ne = self._serialize(
                     tile_image_ne,
                     labelled_image_ne,
-                    label_dict,
+                    label_vector,
                     image_filename,
                     output_dir,
                     x,
@@ -141,7 +144,7 @@ class AerialDataset(GeoreferencedDataset):
                 tiled_results_sw = self._serialize(
                     tile_image_sw,
                     labelled_image_sw,
-                    label_dict,
+                    label_vector,
                     image_filename,
                     output_dir,
                     x,
@@ -158,7 +161,7 @@ class AerialDataset(GeoreferencedDataset):
                 tiled_results_se = self._serialize(
                     tile_image_se,
                     labelled_image_se,
-                    label_dict,
+                    label_vector,
                     image_filename,
                     output_dir,
                     x,
@@ -175,7 +178,7 @@ class AerialDataset(GeoreferencedDataset):
                     tiled_results = self._serialize(
                         tile_image,
                         labelled_image,
-                        label_dict,
+                        label_vector,
                         image_filename,
                         output_dir,
                         x,
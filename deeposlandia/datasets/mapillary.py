@@ -5,7 +5,7 @@ applications. Data is downloadable at https://www.mapillary.com/dataset/vistas.
 
 """
 
-from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
 import os
 
 import daiquiri
@@ -18,6 +18,9 @@ from deeposlandia import utils
 
 logger = daiquiri.getLogger(__name__)
 
+# raw label images are 8-bit images, whose pixel values are label ids
+NB_RAW_LABELS = 256
+
 
 class MapillaryDataset(Dataset):
     """Dataset structure that gathers all information related to the Mapillary
@@ -66,6 +69,19 @@ class MapillaryDataset(Dataset):
                 label["contains_id"],
                 label["contains"]
             )
+        self.build_aggregation_lut()
+
+    def build_aggregation_lut(self):
+        """Build the lookup table that maps every raw label id to its
+        aggregated label id
+
+        The aggregation rules are applied sequentially on the table rather
+        than on the images, so as to group any label image in a single pass.
+        """
+        lut = np.arange(NB_RAW_LABELS, dtype=np.uint8)
+        for root_id, label in enumerate(self.label_info):
+            lut[np.isin(lut, label.get("aggregate"))] = root_id
+        self.aggregation_lut = lut
 
     def group_image_label(self, image):
         """Group the labels
@@ -83,15 +99,11 @@ class MapillaryDataset(Dataset):
         """
         # turn all label ids into the lowest digits/label id
         # according to its "group" (manually built)
-        a = np.array(image)
-        for root_id, label in enumerate(self.label_info):
-            for label_id in label.get("aggregate"):
-                mask = a == label_id
-                a[mask] = root_id
+        a = self.aggregation_lut[np.asarray(image)]
         return Image.fromarray(a, mode=image.mode)
 
     def _preprocess(
-        self, image_filename, output_dir, labelling=True
+        self, image_filename, output_dir, labelling=True, crop_ratio=None
     ):
         """Resize/crop then save the training & label images
 
@@ -100,6 +112,8 @@ class MapillaryDataset(Dataset):
         datadir : str
         image_filaname : str
         labelling : boolean
+        crop_ratio : float
+            Relative crop position along the largest image dimension
 
         Returns
         -------
@@ -108,45 +122,47 @@ class MapillaryDataset(Dataset):
         """
         # open original images
         img_in = Image.open(image_filename)
+        image_dir, image_basename = os.path.split(image_filename)
+        if labelling:
+            label_filename = os.path.join(
+                os.path.dirname(image_dir),
+                "labels",
+                os.path.splitext(image_basename)[0] + ".png",
+            )
+            img_out = Image.open(label_filename)
+        else:
+            img_out = None
 
-        # resize images
-        # (self.image_size*larger_size or larger_size*self.image_size)
-        img_in = utils.resize_image(img_in, self.image_size)
-
-        # crop images to get self.image_size*self.image_size dimensions
-        crop_pix = np.random.randint(0, 1 + max(img_in.size) - self.image_size)
-        final_img_in = utils.mono_crop_image(img_in, crop_pix)
+        # resize and crop images in a single pass, to get
+        # self.image_size*self.image_size dimensions
+        final_img_in, label_out, raw_labels = utils.fused_resize_crop_label(
+            img_in, img_out, self.image_size, NB_RAW_LABELS, crop_ratio
+        )
 
         # save final image
-        new_in_filename = os.path.join(
-            output_dir, "images", os.path.basename(image_filename)
-        )
+        new_in_filename = os.path.join(output_dir, "images", image_basename)
         final_img_in.save(new_in_filename)
 
         # label_filename vs label image
         if labelling:
-            label_filename = image_filename.replace("images/", "labels/")
-            label_filename = label_filename.replace(".jpg", ".png")
-            img_out = Image.open(label_filename)
-            img_out = utils.resize_image(img_out, self.image_size)
-            img_out = utils.mono_crop_image(img_out, crop_pix)
-            # aggregate some labels
-            img_out = self.group_image_label(img_out)
-
-            labels = utils.build_labels(
-                img_out, self.label_ids, dataset="mapillary"
-            )
+            # aggregate some labels, directly on the label id array
+            label_out = self.aggregation_lut[label_out]
+            # derive the label vector from the same lookup table, so that it
+            # is consistent with the saved label image
+            grouped_labels = np.zeros(NB_RAW_LABELS, dtype=bool)
+            grouped_ids = self.aggregation_lut[np.flatnonzero(raw_labels)]
+            grouped_labels[grouped_ids] = True
+            labels = [int(grouped_labels[i]) for i in self.label_ids]
             new_out_filename = os.path.join(
                 output_dir, "labels", os.path.basename(label_filename)
             )
-            label_out = np.array(img_out)
             final_img_out = utils.build_image_from_config(
                 label_out, self.label_info
             )
-            final_img_out.save(new_out_filename)
+            final_img_out.save(new_out_filename, compress_level=1)
         else:
             new_out_filename = None
-            labels = {i: 0 for i in range(self.get_nb_labels())}
+            labels = [0] * self.get_nb_labels()
 
         return {
             "raw_filename": image_filename,
@@ -181,7 +197,8 @@ class MapillaryDataset(Dataset):
         labelling: boolean
             If True labels are recovered from dataset, otherwise dummy label are generated
         nb_processes : int
-            Number of processes on which to run the preprocessing
+            Number of threads on which to run the preprocessing (if None, it
+        depends on the number of CPUs)
         """
         if nb_tiles_per_image is not None:
             logger.warning("The ``nb_tiles_per_image`` parameter is useless, it will be ignored.")
@@ -189,17 +206,22 @@ class MapillaryDataset(Dataset):
         image_list_longname = [
             os.path.join(input_dir, "images", l) for l in image_list
         ]
+        # draw every crop position at once, before dispatching the images
+        crop_ratios = np.random.random_sample(len(image_list_longname))
         if nb_processes == 1:
-            for x in image_list_longname:
+            for x, crop_ratio in zip(image_list_longname, crop_ratios):
                 self.image_info.append(
-                    self._preprocess(x, output_dir, labelling)
+                    self._preprocess(x, output_dir, labelling, crop_ratio)
                 )
         else:
-            with Pool(processes=nb_processes) as p:
-                self.image_info = p.starmap(
-                    self._preprocess,
-                    [
-                        (x, output_dir, labelling)
-                        for x in image_list_longname
-                    ],
-                )
+            # image decoding, resizing and encoding release the GIL: threads
+            # avoid pickling the dataset for each image
+            with ThreadPoolExecutor(max_workers=nb_processes) as executor:
+                futures = [
+                    executor.submit(
+                        self._preprocess, x, output_dir, labelling, crop_ratio
+                    )
+                    for x, crop_ratio in zip(image_list_longname, crop_ratios)
+                ]
+                # consume results in submission order to keep image order
+                self.image_info.extend(f.result() for f in futures)
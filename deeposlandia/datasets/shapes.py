@@ -75,7 +75,7 @@ class ShapeDataset(Dataset):
     def generate_labels(self, nb_images):
         """ Generate random shape labels in order to prepare shape image
         generation; use numpy to generate random indices for each labels, these
-        indices will be the positive examples; return a 2D-list
+        indices will be the positive examples; return a 2D-list of 0-1 values
 
         Parameters
         ----------
@@ -91,7 +91,7 @@ class ShapeDataset(Dataset):
         labels = np.zeros([nb_images, self.get_nb_labels()], dtype=int)
         for i in range(self.get_nb_labels()):
             labels[raw_labels[i], i] = 1
-        return [dict([(i, int(j)) for i, j in enumerate(l)]) for l in labels]
+        return labels.tolist()
 
     def populate(
         self,
@@ -135,7 +135,7 @@ class ShapeDataset(Dataset):
         for i, image_label in enumerate(shape_gen):
             bg_color = np.random.randint(0, 255, 3).tolist()
             shape_specs = []
-            for l in image_label.items():
+            for l in image_label:
                 if l:
                     shape_color = np.random.randint(0, 255, 3).tolist()
                     x, y = np.random.randint(
@@ -170,7 +170,8 @@ class ShapeDataset(Dataset):
         the new image, 0 otherwise; the label list length correspond to the
         number of labels in the dataset
         """
-        if image_id in self.image_info:
+        # image ids are the image positions in `image_info`
+        if image_id < len(self.image_info):
             logger.error(
                 "Image %s already stored into the label set.", image_id
             )
@@ -227,12 +228,13 @@ class ShapeDataset(Dataset):
             color, x, y, s = image_info["shape_specs"][self.TRIANGLE]
             color = tuple(map(int, color))
             x, y, s = map(int, (x, y, s))
+            half_base = s / math.sin(math.radians(60))
             points = np.array(
                 [
                     [
                         (x, y - s),
-                        (x - s / math.sin(math.radians(60)), y + s),
-                        (x + s / math.sin(math.radians(60)), y + s),
+                        (x - half_base, y + s),
+                        (x + half_base, y + s),
                     ]
                 ],
                 dtype=np.int32,
@@ -243,9 +245,9 @@ class ShapeDataset(Dataset):
             datapath, "images", "shape_{:05}.png".format(image_id)
         )
         self.image_info[image_id]["image_filename"] = image_filename
-        Image.fromarray(image).save(image_filename)
+        Image.fromarray(image).save(image_filename, compress_level=1)
         label_filename = os.path.join(
             datapath, "labels", "shape_{:05}.png".format(image_id)
         )
         self.image_info[image_id]["label_filename"] = label_filename
-        Image.fromarray(label).save(label_filename)
+        Image.fromarray(label).save(label_filename, compress_level=1)
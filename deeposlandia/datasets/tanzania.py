@@ -108,8 +108,11 @@ class TanzaniaDataset(GeoreferencedDataset):
             image_filename.split("/")[-1], raw_img_width, raw_img_height
         )
 
-        label_filename = image_filename.replace("images", "labels").replace(
-            ".tif", ".geojson"
+        image_dir, image_basename = os.path.split(image_filename)
+        label_filename = os.path.join(
+            os.path.dirname(image_dir),
+            "labels",
+            os.path.splitext(image_basename)[0] + ".geojson",
         )
         labels = gpd.read_file(label_filename)
         labels = labels.loc[~labels.geometry.isna(), ["condition", "geometry"]]
@@ -133,7 +136,7 @@ class TanzaniaDataset(GeoreferencedDataset):
                 raster_features, labels, x, y, self.image_size, self.image_size
             )
             mask = self.load_mask(tile_items, raster_features, x, y)
-            label_dict = utils.build_labels(
+            label_vector = utils.build_labels(
                 mask, range(self.get_nb_labels()), "tanzania"
             )
             labelled_image = utils.build_image_from_config(mask, self.labels)
@@ -141,7 +144,7 @@ class TanzaniaDataset(GeoreferencedDataset):
                 tiled_results = self._serialize(
                     tile_image,
                     labelled_image,
-                    label_dict,
+                    label_vector,
                     image_filename,
                     output_dir,
                     x,
@@ -158,7 +161,7 @@ class TanzaniaDataset(GeoreferencedDataset):
                 tiled_results_ne = self._serialize(
                     tile_image_ne,
                     labelled_image_ne,
-                    label_dict,
+                    label_vector,
                     image_filename,
                     output_dir,
                     x,
@@ -175,7 +178,7 @@ class TanzaniaDataset(GeoreferencedDataset):
                 tiled_results_sw = self._serialize(
                     tile_image_sw,
                     labelled_image_sw,
-                    label_dict,
+                    label_vector,
                     image_filename,
                     output_dir,
                     x,
@@ -192,7 +195,7 @@ class TanzaniaDataset(GeoreferencedDataset):
                 tiled_results_se = self._serialize(
                     tile_image_se,
                     labelled_image_se,
-                    label_dict,
+                    label_vector,
                     image_filename,
                     output_dir,
                     x,
@@ -209,7 +212,7 @@ class TanzaniaDataset(GeoreferencedDataset):
                     tiled_results = self._serialize(
                         tile_image,
                         labelled_image,
-                        label_dict,
+                        label_vector,
                         image_filename,
                         output_dir,
                         x,
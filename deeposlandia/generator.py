@@ -26,14 +26,58 @@ def recover_label_id(img, label_config):
         Array of pixel labels of shape (width, heigth)
     """
     reshaped_img = img.reshape([-1, 3])
-    label_img = np.full(
-        shape=reshaped_img.shape[0], fill_value=-1, dtype=reshaped_img.dtype
+    if len(label_config) == 0:
+        label_img = np.full(reshaped_img.shape[0], -1)
+        return label_img.astype(reshaped_img.dtype).reshape(img.shape[:3])
+    pixel_keys = rgb_keys(reshaped_img)
+    # sorted color -> id lookup table; with duplicated colors, the last label
+    # prevails
+    label_keys = rgb_keys(
+        np.array(
+            [np.broadcast_to(label["color"], 3) for label in label_config]
+        )
+    )
+    order = np.argsort(label_keys, kind="stable")
+    label_keys = label_keys[order]
+    label_ids = np.array([label["id"] for label in label_config])[order]
+    positions = np.searchsorted(label_keys, pixel_keys, side="right") - 1
+    positions = positions.clip(min=0)
+    matches = label_keys[positions] == pixel_keys
+    if reshaped_img.dtype != np.uint8:
+        # pixels that are not 8-bit colors (e.g. non-integral float values)
+        # match no label, instead of being truncated into a label color
+        matches &= np.all(
+            (reshaped_img == np.round(reshaped_img))
+            & (reshaped_img >= 0)
+            & (reshaped_img <= 255),
+            axis=1,
+        )
+    label_img = np.where(matches, label_ids[positions], -1).astype(
+        reshaped_img.dtype
     )
-    for label in label_config:
-        label_img[np.all(label["color"] == reshaped_img, axis=1)] = label["id"]
     return label_img.reshape(img.shape[:3])
 
 
+def rgb_keys(colors):
+    """Encode RGB colors as single integers, so as to compare colors in one
+    operation
+
+    Parameters
+    ----------
+    colors : np.array
+        Colors of shape (nb_colors, 3), with integer channel values between 0
+    and 255 (other values are truncated, and may give the key of another
+    color)
+
+    Returns
+    -------
+    np.array
+        Integer color keys of shape (nb_colors,)
+    """
+    colors = colors.astype(np.uint32)
+    return (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+
+
 def feature_detection_labelling(img, label_config):
     """One-hot encoding for feature detection problem
 
@@ -45,14 +45,15 @@ def build_labels(filtered_image, label_ids, dataset="mapillary"):
 
     Returns
     -------
-    dict
-        label ids occur or not in the image
+    list
+        0-1 values, the i-th value being 1 if the i-th label id occurs in the
+    image
     """
-    image_data = np.array(filtered_image)
-    available_labels = np.unique(image_data)
-    if dataset == "aerial":
-        available_labels[available_labels == 255] = 1
-    return {i: 1 if i in available_labels else 0 for i in label_ids}
+    image_data = np.asarray(filtered_image).ravel()
+    available_labels = np.bincount(image_data, minlength=1 + max(label_ids))
+    if dataset == "aerial" and available_labels.size > 255:
+        available_labels[1] += available_labels[255]
+    return [int(available_labels[i] > 0) for i in label_ids]
 
 
 def resize_image(img, base_size):
@@ -84,6 +85,82 @@ def mono_crop_image(img, crop_pixel):
         return img.crop((0, crop_pixel, img.width, crop_pixel + img.width))
 
 
+def fused_resize_crop_label(
+    img_in, img_out, image_size, nb_labels, crop_ratio=None
+):
+    """Resize and crop an image and its label version in a single pass, and
+    build the label presence vector from the cropped label image
+
+    The input image resizing box already accounts for the random crop offset,
+    so that only the final `image_size*image_size` pixels are interpolated,
+    instead of resizing the whole image and cropping it afterwards. The label
+    image is resized with a nearest neighbour filter, then cropped as a
+    `numpy.array` slice, which gives the same label ids as `resize_image`
+    followed by `mono_crop_image`.
+
+    Parameters
+    ----------
+    img_in : PIL.Image
+        Raw input image
+    img_out : PIL.Image
+        Raw label image, with label ids as pixel values (if None, no label is
+    computed)
+    image_size : int
+        Size of the output images (height=width)
+    nb_labels : int
+        Number of label ids that may be encountered in `img_out`
+    crop_ratio : float
+        Relative position of the crop along the largest image dimension,
+    between 0 and 1 (if None, it is drawn at random)
+
+    Returns
+    -------
+    tuple
+        Cropped input image, cropped label ids as a `numpy.array` and 0/1
+    label presence vector (the two last items are None if `img_out` is None)
+    """
+    if crop_ratio is None:
+        crop_ratio = np.random.random_sample()
+    old_width, old_height = img_in.size
+    if old_width < old_height:
+        new_size = (image_size, int(image_size * old_height / old_width))
+    else:
+        new_size = (int(image_size * old_width / old_height), image_size)
+    crop_pix = int(crop_ratio * (1 + max(new_size) - image_size))
+    if new_size[0] > new_size[1]:
+        left, top = crop_pix, 0
+    else:
+        left, top = 0, crop_pix
+
+    # decode JPEG images at a reduced scale when they are far larger than
+    # the output size (no-op for other formats)
+    img_in.draft("RGB", (2 * image_size, 2 * image_size))
+    x_scale = img_in.width / new_size[0]
+    y_scale = img_in.height / new_size[1]
+    box = (
+        left * x_scale,
+        top * y_scale,
+        min((left + image_size) * x_scale, img_in.width),
+        min((top + image_size) * y_scale, img_in.height),
+    )
+    # reducing_gap first shrinks large images with a cheap box reduction,
+    # the bilinear filter being applied on the reduced image
+    cropped_in = img_in.resize(
+        (image_size, image_size),
+        resample=Image.BILINEAR,
+        box=box,
+        reducing_gap=2.0,
+    )
+    if img_out is None:
+        return cropped_in, None, None
+    # nearest neighbour resampling keeps valid label ids
+    label_ids = np.asarray(img_out.resize(new_size, resample=Image.NEAREST))
+    cropped_out = label_ids[top:(top + image_size), left:(left + image_size)]
+    counts = np.bincount(cropped_out.ravel(), minlength=nb_labels)
+    labels = (counts[:nb_labels] > 0).astype(np.uint8)
+    return cropped_in, cropped_out, labels
+
+
 def flip_image(img, proba=0.5):
     """ Flip image `img` horizontally with a probability of `proba`
 
@@ -287,13 +364,16 @@ def build_image_from_config(data, config):
     np.array
         RGB-version of labelled images, with shape (imsize, imsize, 3)
     """
-    result = np.zeros(
-        shape=(data.shape[0], data.shape[1], 3), dtype=data.dtype
-    )
+    # color lookup table, pixels with unknown label ids remain black; the
+    # last row is kept black for negative label ids
+    max_label_id = int(data.max()) if data.size else -1
+    nb_colors = max(len(config), max_label_id + 1)
+    colors = np.zeros(shape=(nb_colors + 1, 3), dtype=np.uint8)
     for label in range(len(config)):
-        mask = data == label
-        result[mask] = config[label]["color"]
-    return Image.fromarray(result)
+        colors[label] = config[label]["color"]
+    if np.issubdtype(data.dtype, np.signedinteger):
+        data = np.where(data < 0, nb_colors, data)
+    return Image.fromarray(colors[data])
 
 
 def create_symlink(link_name, directory):
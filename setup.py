@@ -22,7 +22,7 @@ install_requires = [
     "tensorflow==2.0.1",
     "opencv-python<=4.2.0.34",
     "numpy<=1.16.2",
-    "pillow<=7.1.1",
+    "pillow>=7.0.0,<=7.1.1",
     "keras<=2.3.1",
     "daiquiri<=2.1.1",
     "Flask<=1.0.2",
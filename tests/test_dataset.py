@@ -1,10 +1,13 @@
 """Unit test related to the dataset creation, population and loading
 """
 
+import json
 import numpy as np
 import os
 import pytest
+from PIL import Image
 
+from deeposlandia import datasets, utils
 from deeposlandia.datasets.shapes import ShapeDataset
 from deeposlandia.datasets.mapillary import MapillaryDataset
 from deeposlandia.datasets.aerial import AerialDataset
@@ -72,6 +75,123 @@ def test_mapillary_dataset_population_without_labels(
     )
 
 
+def test_mapillary_dataset_threaded_population(
+    mapillary_image_size,
+    mapillary_raw_sample,
+    mapillary_nb_images,
+    mapillary_input_config,
+    mapillary_sample_without_labels_dir,
+    tmpdir,
+):
+    """Populate a Mapillary dataset with several threads:
+    * for a given random seed, images are recorded in the same order, with the
+    same labels and the same preprocessed files as with a sequential population
+    * a missing label image still raises a FileNotFoundError
+    """
+    datasets_by_processes = {}
+    for nb_processes in (1, 2):
+        output_dir = tmpdir.mkdir("processes_{}".format(nb_processes))
+        output_dir.mkdir("images")
+        output_dir.mkdir("labels")
+        np.random.seed(42)
+        d = MapillaryDataset(mapillary_image_size, mapillary_input_config)
+        d.populate(
+            str(output_dir),
+            mapillary_raw_sample,
+            nb_images=mapillary_nb_images,
+            nb_processes=nb_processes,
+        )
+        datasets_by_processes[nb_processes] = d
+    sequential = datasets_by_processes[1].image_info
+    threaded = datasets_by_processes[2].image_info
+    assert len(threaded) == mapillary_nb_images
+    assert [img["raw_filename"] for img in threaded] == [
+        img["raw_filename"] for img in sequential
+    ]
+    assert [img["labels"] for img in threaded] == [
+        img["labels"] for img in sequential
+    ]
+    for seq_img, thr_img in zip(sequential, threaded):
+        for key in ("image_filename", "label_filename"):
+            assert np.array_equal(
+                np.asarray(Image.open(thr_img[key])),
+                np.asarray(Image.open(seq_img[key])),
+            )
+
+    d = MapillaryDataset(mapillary_image_size, mapillary_input_config)
+    with pytest.raises(FileNotFoundError):
+        d.populate(
+            str(tmpdir.join("processes_2")),
+            mapillary_sample_without_labels_dir,
+            nb_images=mapillary_nb_images,
+            nb_processes=2,
+        )
+
+
+def test_mapillary_label_grouping(
+    mapillary_image_size, mapillary_input_config
+):
+    """Group the labels of a Mapillary label image through the aggregation
+    lookup table, and compare the result with a sequential masking of every
+    aggregated label id
+    """
+    d = MapillaryDataset(mapillary_image_size, mapillary_input_config)
+    raw_labels = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    expected = raw_labels.copy()
+    for root_id, label in enumerate(d.label_info):
+        for label_id in label["aggregate"]:
+            expected[expected == label_id] = root_id
+    grouped = d.group_image_label(Image.fromarray(raw_labels, mode="L"))
+    assert np.array_equal(np.asarray(grouped), expected)
+
+
+def test_mapillary_fused_resize_crop_label(
+    mapillary_image_size, mapillary_raw_sample
+):
+    """Resize and crop Mapillary images in a single pass:
+    * the label crop must be the same as with the former resize-then-crop
+    pipeline, for a fixed crop position
+    * the label vector must indicate the label ids of the label crop
+    * without label image, only the input image is resized and cropped
+    """
+    image_dir = os.path.join(mapillary_raw_sample, "images")
+    label_dir = os.path.join(mapillary_raw_sample, "labels")
+    for image_name in os.listdir(image_dir):
+        image_filename = os.path.join(image_dir, image_name)
+        label_filename = os.path.join(
+            label_dir, os.path.splitext(image_name)[0] + ".png"
+        )
+        for crop_ratio in (0.0, 0.5, 0.999):
+            img_in, img_out, labels = utils.fused_resize_crop_label(
+                Image.open(image_filename),
+                Image.open(label_filename),
+                mapillary_image_size,
+                256,
+                crop_ratio,
+            )
+            resized_label = utils.resize_image(
+                Image.open(label_filename), mapillary_image_size
+            )
+            crop_pix = int(
+                crop_ratio
+                * (1 + max(resized_label.size) - mapillary_image_size)
+            )
+            expected_label = np.asarray(
+                utils.mono_crop_image(resized_label, crop_pix)
+            )
+            assert img_in.size == (mapillary_image_size, mapillary_image_size)
+            assert np.array_equal(img_out, expected_label)
+            assert np.flatnonzero(labels).tolist() == (
+                np.unique(expected_label).tolist()
+            )
+        img_in, img_out, labels = utils.fused_resize_crop_label(
+            Image.open(image_filename), None, mapillary_image_size, 256
+        )
+        assert img_in.size == (mapillary_image_size, mapillary_image_size)
+        assert img_out is None
+        assert labels is None
+
+
 def test_mapillary_dataset_loading(
     mapillary_image_size,
     mapillary_nb_images,
@@ -87,6 +207,65 @@ def test_mapillary_dataset_loading(
     assert d.get_nb_images() == mapillary_nb_images
 
 
+def test_dataset_label_formats(
+    mapillary_image_size,
+    mapillary_input_config,
+    mapillary_sample_config,
+    tmpdir,
+):
+    """Load a dataset whose image labels are stored as `{label_id: 0/1}`
+    dicts (former format) and the same dataset with labels stored as 0-1
+    lists: label popularity must be the same, and it must be preserved by a
+    save/load round-trip
+    """
+    dict_dataset = MapillaryDataset(
+        mapillary_image_size, mapillary_input_config
+    )
+    dict_dataset.load(mapillary_sample_config)
+    assert all(
+        isinstance(img["labels"], dict) for img in dict_dataset.image_info
+    )
+    expected_popularity = np.round(
+        np.mean(
+            [list(img["labels"].values()) for img in dict_dataset.image_info],
+            axis=0,
+        ),
+        3,
+    )
+    assert np.array_equal(
+        dict_dataset.get_label_popularity(), expected_popularity
+    )
+
+    with open(mapillary_sample_config) as fobj:
+        content = json.load(fobj)
+    for image in content["images"]:
+        image["labels"] = list(image["labels"].values())
+    list_config = str(tmpdir.join("list_labels.json"))
+    with open(list_config, "w") as fobj:
+        json.dump(content, fobj)
+    list_dataset = MapillaryDataset(
+        mapillary_image_size, mapillary_input_config
+    )
+    list_dataset.load(list_config)
+    assert all(
+        isinstance(img["labels"], list) for img in list_dataset.image_info
+    )
+    assert np.array_equal(
+        list_dataset.get_label_popularity(), expected_popularity
+    )
+
+    for d in (dict_dataset, list_dataset):
+        resaved_config = str(tmpdir.join("resaved.json"))
+        d.save(resaved_config)
+        reloaded = MapillaryDataset(
+            mapillary_image_size, mapillary_input_config
+        )
+        reloaded.load(resaved_config)
+        assert np.array_equal(
+            reloaded.get_label_popularity(), expected_popularity
+        )
+
+
 def test_shape_dataset_creation(shapes_image_size, shapes_nb_labels):
     """Create a Shapes dataset
     """
@@ -129,6 +308,56 @@ def test_shape_dataset_loading(
     assert d.get_nb_images() == shapes_nb_images
 
 
+@pytest.mark.parametrize("json_backend", ["orjson", "json"])
+def test_dataset_save_load_json_backends(
+    shapes_image_size, shapes_nb_images, tmpdir, monkeypatch, json_backend
+):
+    """Save and load a Shapes dataset with orjson, or with the standard json
+    module when orjson is not installed; both must produce the same json
+    document
+    """
+    if json_backend == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(datasets, "orjson", None)
+    d = ShapeDataset(shapes_image_size)
+    d.populate(nb_images=shapes_nb_images)
+    filename = str(tmpdir.join("shapes.json"))
+    d.save(filename)
+    with open(filename) as fobj:
+        content = json.load(fobj)
+    assert content["image_size"] == shapes_image_size
+    assert content["images"] == d.image_info
+    loaded = ShapeDataset(shapes_image_size)
+    loaded.load(filename)
+    assert loaded.get_nb_labels() == d.get_nb_labels()
+    assert loaded.image_info == d.image_info
+
+
+@pytest.mark.parametrize("nb_images", [0, 1, 10])
+def test_dataset_save_load_round_trip(shapes_image_size, tmpdir, nb_images):
+    """Save a Shapes dataset with 0, 1 or several images, then load it: the
+    saved file must be a valid json document, and the loaded dataset must be
+    the same as the saved one
+    """
+    d = ShapeDataset(shapes_image_size)
+    d.populate(nb_images=nb_images)
+    filename = str(tmpdir.join("shapes.json"))
+    d.save(filename)
+    with open(filename) as fobj:
+        content = json.load(fobj)
+    assert sorted(content.keys()) == ["image_size", "images", "labels"]
+    assert len(content["images"]) == nb_images
+    loaded = ShapeDataset(shapes_image_size)
+    loaded.load(filename)
+    assert loaded.image_size == d.image_size
+    assert loaded.get_nb_images() == nb_images
+    assert loaded.image_info == d.image_info
+    assert [label["name"] for label in loaded.label_info] == [
+        label["name"] for label in d.label_info
+    ]
+
+
 def test_aerial_dataset_creation(
     aerial_image_size, aerial_nb_labels
 ):
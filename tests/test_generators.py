@@ -119,6 +119,88 @@ def test_feature_detection_labelling_sparse():
     assert b.shape == (a.shape[0], len(labels))
 
 
+def test_recover_label_id():
+    """Test `recover_label_id` function in `generator` module:
+    * pixels with an unknown color are labelled as -1
+    * scalar colors (grayscale labels) stand for the three RGB channels
+    * if several labels share a color, the last one prevails
+    * pixel values that are not 8-bit colors (non-integral, negative or too
+    large values) match no label
+    * with an empty label configuration, all the pixels are labelled as -1
+    * on random data, the result is the same as comparing each label color
+    with the whole image
+    """
+    img = np.array(
+        [
+            [
+                [[10, 10, 200], [200, 10, 10], [255, 255, 255]],
+                [[0, 0, 0], [1, 2, 3], [10, 200, 10]],
+            ]
+        ],
+        dtype=np.float32,
+    )
+    config = [
+        {"id": 0, "color": [10, 10, 200]},
+        {"id": 1, "color": [200, 10, 10]},
+        {"id": 2, "color": 255},
+        {"id": 3, "color": 0},
+        {"id": 4, "color": [200, 10, 10]},
+    ]
+    labels = generator.recover_label_id(img, config)
+    assert labels.shape == img.shape[:3]
+    assert labels.tolist() == [[[0, 4, 2], [3, -1, -1]]]
+
+    img = np.array([[[[200.6, 10, 10], [200, 10, 10], [-56, 10, 10]]]])
+    labels = generator.recover_label_id(img, config)
+    assert labels.tolist() == [[[-1, 4, -1]]]
+    img = np.array([[[[456, 10, 10], [200, 10, 10]]]], dtype=np.int64)
+    labels = generator.recover_label_id(img, config)
+    assert labels.tolist() == [[[-1, 4]]]
+    labels = generator.recover_label_id(img, [])
+    assert labels.tolist() == [[[-1, -1]]]
+
+    rng = np.random.RandomState(0)
+    colors = rng.randint(0, 3, size=(8, 3)) * 100
+    config = [
+        {"id": i, "color": color.tolist()} for i, color in enumerate(colors)
+    ]
+    img = (rng.randint(0, 3, size=(2, 16, 16, 3)) * 100).astype(np.float32)
+    reshaped_img = img.reshape([-1, 3])
+    expected = np.full(reshaped_img.shape[0], -1, dtype=img.dtype)
+    for label in config:
+        expected[np.all(label["color"] == reshaped_img, axis=1)] = label["id"]
+    labels = generator.recover_label_id(img, config)
+    assert np.array_equal(labels, expected.reshape(img.shape[:3]))
+
+
+def test_build_image_from_config():
+    """Test `build_image_from_config` function in `utils` module:
+    * label ids are colored according to the label configuration, scalar
+    colors standing for the three RGB channels
+    * unknown label ids, either too large or negative, remain black
+    * an empty label array gives an empty image
+    * colors are turned back into label ids by `recover_label_id`
+    """
+    config = [
+        {"id": 0, "color": [10, 10, 200]},
+        {"id": 1, "color": 255},
+        {"id": 2, "color": [10, 200, 10]},
+    ]
+    data = np.array([[0, 1], [2, 5], [-1, 0]])
+    image = np.asarray(utils.build_image_from_config(data, config))
+    assert image.tolist() == [
+        [[10, 10, 200], [255, 255, 255]],
+        [[10, 200, 10], [0, 0, 0]],
+        [[0, 0, 0], [10, 10, 200]],
+    ]
+    data = np.zeros((0, 4), dtype=np.int64)
+    assert utils.build_image_from_config(data, config).size == (4, 0)
+    data = np.array([[0, 1], [2, 1]], dtype=np.uint8)
+    image = np.asarray(utils.build_image_from_config(data, config))
+    labels = generator.recover_label_id(image[np.newaxis], config)
+    assert labels[0].tolist() == data.tolist()
+
+
 def test_featdet_mapillary_generator(
     mapillary_image_size,
     mapillary_sample,